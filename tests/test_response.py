@@ -0,0 +1,48 @@
+import unittest
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from webants.libs import Request, Response
+
+
+def _response(body: bytes, content_type: str | None = "text/html") -> Response:
+    headers = CIMultiDict()
+    if content_type:
+        headers["Content-Type"] = content_type
+    return Response(
+        "GET",
+        "http://www.example.com/",
+        status_code=200,
+        reason="OK",
+        request=Request("http://www.example.com/"),
+        headers=CIMultiDictProxy(headers),
+        body=body,
+    )
+
+
+class ResponseEncodingTest(unittest.TestCase):
+    def test_empty_html_body_is_text(self):
+        response = _response(b"")
+        self.assertEqual(response.encoding, "utf-8")
+        self.assertEqual(response.text, "")
+
+    def test_empty_body_without_headers_is_text(self):
+        response = _response(b"", content_type=None)
+        self.assertEqual(response.text, "")
+
+    def test_charset_from_headers(self):
+        response = _response(
+            "<title>中文</title>".encode("gbk"), "text/html; charset=gbk"
+        )
+        self.assertEqual(response.encoding, "gbk")
+        self.assertEqual(response.title, "中文")
+
+    def test_detect_encoding_from_body(self):
+        html = "<html><head><title>中文标题测试页面</title></head><body>"
+        html += "这是一个用于检测编码的中文段落。" * 20 + "</body></html>"
+        response = _response(html.encode("gbk"))
+        self.assertEqual(response.title, "中文标题测试页面")
+
+
+if __name__ == "__main__":
+    unittest.main()
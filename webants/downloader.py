@@ -2,7 +2,7 @@
 
     Downloader从request_queue队列中获取request，进行获取，并根据获取的结果类型放入相应的队列中：
 
-    response类型，放入response_queue队列中；
+    response类型，按批次（list）放入response_queue队列中；
 
     request类型，重新放入request队列中，等待再次重试获取；
 
@@ -10,16 +10,54 @@
 import asyncio
 import logging
 import queue
+import time
 from abc import abstractmethod
-from inspect import iscoroutinefunction
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Union
 
 import aiohttp
 
+try:
+    import aiodns
+except ImportError:
+    aiodns = None
+
+from webants.libs.exceptions import ResponseTooLarge
 from webants.libs.request import Request
-from webants.libs.response import Response, get_encoding
+from webants.libs.response import Response
 from webants.utils.logger import get_logger
+from webants.utils.misc import new_event_loop
+
+
+class TokenBucket:
+    """令牌桶限速器
+
+    以每秒rate个的速度生成令牌，桶中最多存放capacity个令牌；
+    所有下载任务共享同一个令牌桶。
+
+    不逐个等待令牌，而是在acquire()时直接预约下一个可用的令牌：
+    记录桶中令牌被用完的时间点，每次预约后向后推移1/rate秒。
+    预约在await之前完成，并发的请求各自得到不同的发出时间，不需要加锁。
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._interval = 1 / rate
+        # 桶中令牌被用完的时间点，不晚于当前时间时表示桶是满的
+        self._empty_at = time.monotonic()
+
+    async def acquire(self) -> None:
+        now = time.monotonic()
+        # 桶中最多存放capacity个令牌，空闲时间不会无限累积令牌
+        empty_at = max(self._empty_at, now)
+        # 桶中剩余至少1个令牌的时间点
+        ready_at = empty_at - (self.capacity - 1) * self._interval
+        self._empty_at = empty_at + self._interval
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
 
 
 class BaseDownloader:
@@ -74,6 +112,7 @@ class Downloader(BaseDownloader):
         log_level: int = logging.INFO,
         concurrency: int = 10,
         loop: asyncio.AbstractEventLoop | None = None,
+        session: aiohttp.ClientSession | None = None,
         **kwargs,
     ):
         """
@@ -81,8 +120,9 @@ class Downloader(BaseDownloader):
         :param request_queue:
         :param response_queue
         :param log_level:
-        :param concurrency: asyncio.Semaphore,控制并行下载的连接数
+        :param concurrency: 控制并行下载的连接数
         :param loop:
+        :param session: 外部创建的ClientSession，由调用者负责关闭；为None时自行创建
         :param kwargs
         """
         super(Downloader, self).__init__(
@@ -97,23 +137,45 @@ class Downloader(BaseDownloader):
             try:
                 self.loop = asyncio.get_running_loop()
             except RuntimeError:
-                self.loop = asyncio.new_event_loop()
+                self.loop = new_event_loop()
                 asyncio.set_event_loop(self.loop)
                 self._close_loop = True
 
         self._close_session = False
         self.cookies = kwargs.get("cookies", {})
-        self.session = aiohttp.ClientSession(loop=self.loop, cookies=self.cookies)
-        self._close_session = True
+        if session is not None:
+            # 复用外部的session及其连接池
+            self.session = session
+        else:
+            # 连接池上限默认与aiohttp相同（100），延长keep-alive时间，
+            # 使同一host的请求尽量复用已建立的连接，减少TCP+TLS握手次数
+            connector = aiohttp.TCPConnector(
+                loop=self.loop,
+                limit=kwargs.get("connection_limit", 100),
+                limit_per_host=kwargs.get("connection_limit_per_host", 0),
+                keepalive_timeout=kwargs.get("keepalive_timeout", 60.0),
+                # 缓存DNS解析结果，安装了aiodns时使用异步解析，避免在线程池中阻塞解析
+                ttl_dns_cache=kwargs.get("ttl_dns_cache", 300),
+                resolver=aiohttp.AsyncResolver(loop=self.loop) if aiodns else None,
+            )
+            self.session = aiohttp.ClientSession(
+                loop=self.loop, cookies=self.cookies, connector=connector
+            )
+            self._close_session = True
 
         self.request_queue = request_queue
         assert isinstance(self.request_queue, asyncio.PriorityQueue)
         self.response_queue = response_queue
 
         self.concurrency = concurrency
-        self.sem = asyncio.Semaphore(concurrency)
+        # 并发控制：_active为正在下载的请求数，_max为允许的最大并发数
+        self._cond = asyncio.Condition()
+        self._active = 0
+        self._max = concurrency
         self.kwargs = kwargs or {}
         self.delay = kwargs.get("delay", 0)
+        # delay换算为全局速率限制：每delay秒最多发出一个请求
+        self._rate_limiter = TokenBucket(rate=1 / self.delay) if self.delay else None
         self.headers = kwargs.get("headers", {})
         self.headers.setdefault(
             "User-Agent",
@@ -121,30 +183,57 @@ class Downloader(BaseDownloader):
         )
         # self.cookies = kwargs.get("cookies", {})
         self.default_encoding = kwargs.get("encoding", "utf-8")
+        # CPU密集型回调函数使用的进程池，首次使用时创建
+        self.cpu_workers = kwargs.get("cpu_workers")
+        self._cpu_pool: ProcessPoolExecutor | None = None
+        # 响应体的最大字节数，超过时放弃该响应，限制每个下载任务占用的内存
+        self.max_body_size = kwargs.get("max_body_size")
+        # URL协议 -> 下载方法
+        self._scheme_handlers = {
+            "http": self._fetch,
+            "https": self._fetch,
+            "file": self._fetch_local,
+        }
+        # 响应按批次放入response_queue，减少消费者的唤醒次数
+        self.batch_size = kwargs.get("batch_size", 16)
+        self._resp_batch: list = []
+        # 下载worker按需创建：_workers为正在运行的worker，_idle_workers为正在等待请求的worker数
+        self._workers: set[asyncio.Task] = set()
+        self._idle_workers = 0
+        self._many = 0
+        # worker空闲超过该时间（s）后退出，至少保留一个worker
+        self.worker_idle_timeout = kwargs.get("worker_idle_timeout", 30.0)
 
     async def _fetch(self, request: Request) -> Union[Response, Exception, None]:
-        delay = request.delay or self.delay
-        self.logger.debug(f"Fetching {request}, delay<{delay}>")
-        await asyncio.sleep(delay)
+        self.logger.debug("Fetching %s", request)
+
+        # 在占用下载槽位之前完成限速等待，避免槽位被sleep白白占用；
+        # 请求自身设置了delay时以其为准，否则使用全局的令牌桶限速
+        if request.delay:
+            await asyncio.sleep(request.delay)
+        elif self._rate_limiter:
+            await self._rate_limiter.acquire()
 
         # if not request.headers:
         request.headers = self.headers or request.headers
 
-        self.logger.debug(f"request headers: {request.headers}")
+        self.logger.debug("request headers: %s", request.headers)
 
         try:
-            async with self.session.request(
-                method=request.method,
-                url=request.url,
-                headers=request.headers,
-                timeout=request.timeout,
-                cookies=self.cookies,
-            ) as r:
-                resp = await Response.build(r, request)
-
-                self.logger.debug(resp)
-                self.download_count += 1
-                return resp
+            # 只在网络I/O期间占用下载槽位，回调和队列操作不受并发数限制
+            async with self._slot():
+                async with self.session.request(
+                    method=request.method,
+                    url=request.url,
+                    headers=request.headers,
+                    timeout=request.timeout,
+                    cookies=self.cookies,
+                ) as r:
+                    resp = await Response.build(r, request, self.max_body_size)
+
+            self.logger.debug(resp)
+            self.download_count += 1
+            return resp
         except asyncio.TimeoutError:
             self.logger.error(
                 f"Timeout, retries {request}<{request.retries}> again later."
@@ -156,9 +245,14 @@ class Downloader(BaseDownloader):
                 f"ClientError, retries {request}<{request.retries}> again later."
             )
             return Exception("aiohttp.ClientError")
+        except ResponseTooLarge as e:
+            self.logger.error(f"ResponseTooLarge, {request}: {e}")
+            # 重试也无法改变响应体大小，不再重试
+            request.retries = 0
+            return e
 
     async def _fetch_local(self, request: Request) -> Union[Response, None]:
-        self.logger.debug(f"Fetching {request}, delay<{0.0}>")
+        self.logger.debug("Fetching %s, delay<%s>", request, 0.0)
         await asyncio.sleep(0.0)
         p = Path(request.url.removeprefix("file:///"))
         if not p.is_file():
@@ -177,7 +271,8 @@ class Downloader(BaseDownloader):
                 headers=None,
                 cookies=None,
                 body=content,
-                encoding=get_encoding(content=content),
+                # 编码在首次访问Response.encoding/text时才检测
+                encoding=None,
                 history=None,
             )
             self.logger.debug(resp)
@@ -187,6 +282,38 @@ class Downloader(BaseDownloader):
             self.logger.error(f"OSError: {e}")
             return None
 
+    def _get_cpu_pool(self) -> ProcessPoolExecutor:
+        if self._cpu_pool is None:
+            self._cpu_pool = ProcessPoolExecutor(max_workers=self.cpu_workers)
+        return self._cpu_pool
+
+    async def _acquire(self) -> None:
+        """等待空闲的下载槽位"""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self._active < self._max)
+            self._active += 1
+
+    async def _release(self) -> None:
+        """释放下载槽位，并唤醒一个等待者"""
+        async with self._cond:
+            self._active -= 1
+            self._cond.notify(1)
+
+    @asynccontextmanager
+    async def _slot(self):
+        """占用一个下载槽位，退出时释放"""
+        await self._acquire()
+        try:
+            yield
+        finally:
+            await self._release()
+
+    async def set_concurrency(self, concurrency: int) -> None:
+        """动态调整最大并发数"""
+        async with self._cond:
+            self.concurrency = self._max = concurrency
+            self._cond.notify_all()
+
     async def _retry(self, request: Request, exception: Exception) -> Response | None:
         request.retries -= 1
         # request.priority += 10
@@ -197,32 +324,31 @@ class Downloader(BaseDownloader):
         if request.retries > 0:
             return await self.fetch(request)
         else:
+            reason = str(exception)
             return Response(
-                request.method.upper(),
-                str(request.url),
+                request.method,
+                request.url,
                 status_code=600,
-                reason=str(exception),
+                reason=reason,
                 request=request,
-                http_version=None,
-                headers=None,
-                cookies=None,
-                body=bytes(str(exception), encoding=self.default_encoding),
+                body=reason.encode(self.default_encoding),
                 encoding=self.default_encoding,
-                history=None,
             )
 
     async def fetch(self, request: Request) -> Union[Response, None]:
+        """下载请求，并根据结果调用回调函数或进行重试
+
+        并发数由_fetch中的下载槽位控制：_active记录正在下载的请求数，
+        当_active达到_max时，_acquire()将保持阻塞，直到有某个任务调用了_release()。
         """
-        信号量会管理一个内部计数器，该计数器会随每次 acquire() 调用递减并随每次 release() 调用递增。
-        计数器的值永远不会降到零以下；当 acquire() 发现其值为零时，它将保持阻塞直到有某个任务调用了 release()。
-        """
+
+        handler = self._scheme_handlers.get(request.url.partition(":")[0].lower())
+        if handler is None:
+            self.logger.error(f"<Error: {request.url} unsupported URL scheme>")
+            return None
 
         try:
-            async with self.sem:
-                if request.url.startswith("http"):
-                    result = await self._fetch(request)
-                elif request.url.startswith("file"):
-                    result = await self._fetch_local(request)
+            result = await handler(request)
         except Exception as e:
             # result = None
             self.logger.error(f"<Error: {request.url} {e}>")
@@ -231,8 +357,27 @@ class Downloader(BaseDownloader):
         if isinstance(result, Response):
             if request.callback is None:
                 return result
-            if iscoroutinefunction(request.callback):
+            if request.callback_is_coro:
                 result = await request.callback(result, request.cb_kwargs)
+            elif getattr(request.callback, "_cpu_bound", False):
+                # 在进程池中执行，避免CPU密集的解析阻塞事件循环
+                body = await self.loop.run_in_executor(
+                    self._get_cpu_pool(),
+                    request.callback,
+                    result.body,
+                    request.cb_kwargs,
+                )
+                # 回调函数只返回处理后的响应体，用它替换原响应的响应体，保留请求等信息
+                if isinstance(body, (bytes, str)):
+                    result = result.set_body(body)
+                else:
+                    if body is not None:
+                        self.logger.error(
+                            "cpu_bound callback %s must return bytes, str or None, got %s",
+                            request.callback.__name__,
+                            type(body).__name__,
+                        )
+                    result = None
             else:
                 result = request.callback(result, request.cb_kwargs)
         elif isinstance(result, Request):
@@ -246,32 +391,77 @@ class Downloader(BaseDownloader):
 
         return result
 
+    @property
+    def worker_limit(self) -> int:
+        """worker数量上限"""
+        return min(self._max, self._many) if self._many else self._max
+
+    def _spawn_worker(self) -> None:
+        task = asyncio.create_task(self.start_worker())
+        self._workers.add(task)
+        task.add_done_callback(self._workers.discard)
+
+    async def _wait_request(self) -> Request | None:
+        """等待下一个请求，空闲超时返回None（最后一个worker不会超时）"""
+        self._idle_workers += 1
+        try:
+            while self.request_queue.empty() and len(self._workers) > 1:
+                try:
+                    return await asyncio.wait_for(
+                        self._next_request(), self.worker_idle_timeout
+                    )
+                except asyncio.TimeoutError:
+                    # 多个worker可能同时超时，立即移出集合，保证至少保留一个worker
+                    if len(self._workers) > 1:
+                        self._workers.discard(asyncio.current_task())
+                        return None
+            return await self._next_request()
+        finally:
+            self._idle_workers -= 1
+
     async def start_worker(self) -> None:
-        """Process queue items forever."""
+        """Process queue items until idle for too long."""
 
         while True:
-            request = await self._next_request()
-            # if request is None:
-            #     continue
+            request = await self._wait_request()
+            if request is None:
+                self.logger.debug("Worker idle timeout, exit.")
+                break
+            # 没有空闲的worker等待后续请求时，补充一个新的worker
+            if not self._idle_workers and len(self._workers) < self.worker_limit:
+                self._spawn_worker()
+
             resp = await self.fetch(request)
 
-            if self.response_queue:
-                self.response_queue.put_nowait(resp)
+            if self.response_queue is not None:
+                if resp is not None:
+                    self._resp_batch.append(resp)
+                # 批次已满，或者没有待下载的请求时，立即提交，避免响应滞留
+                if (
+                    len(self._resp_batch) >= self.batch_size
+                    or self.request_queue.empty()
+                ):
+                    self._flush_responses()
 
             # Notify the queue that the "work item" has been processed.
             self.request_queue.task_done()
 
+    def _flush_responses(self) -> None:
+        """将当前批次的响应作为一个列表放入response_queue"""
+        if self._resp_batch:
+            self.response_queue.put_nowait(self._resp_batch)
+            self._resp_batch = []
+
     async def start_downloader(self, many: int = None) -> None:
-        """Run {many} workers until all tasks finished."""
-        many = many or self.concurrency
+        """Run at most {many} workers until all tasks finished.
+
+        先启动一个worker，随着请求增多逐步增加worker，直到达到并发上限
+        """
+        self._many = many or 0
         self.logger.info(f"Start {self.__class__.__name__}...")
         try:
-            # __ = [asyncio.create_task(self.worker())
-            #       for _ in range(min(self.request_queue.qsize(), self.concurrency) or 1)]
-            __ = [
-                asyncio.create_task(self.start_worker())
-                for _ in range(min(self.concurrency, many))
-            ]
+            if not self._workers:
+                self._spawn_worker()
             await self.request_queue.join()
         except Exception as e:
             raise e
@@ -280,6 +470,17 @@ class Downloader(BaseDownloader):
         self.logger.debug(f"{self.__class__.__name__} already stopped.")
 
     async def close(self) -> None:
+        # 先取消仍在运行的worker，避免其在session关闭后继续下载
+        if self._workers:
+            workers = list(self._workers)
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        if self._cpu_pool is not None:
+            self._cpu_pool.shutdown(wait=False, cancel_futures=True)
+            self._cpu_pool = None
+
         if self._close_session:
             await asyncio.gather(self.session.close())
             self._close_session = False
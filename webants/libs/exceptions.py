@@ -10,6 +10,7 @@ __all__ = [
     'InvalidRequestMethod',
     'InvalidURL',
     'NotAbsoluteURLError',
+    'ResponseTooLarge',
 
 ]
 
@@ -40,3 +41,7 @@ class InvalidURL(Exception):
 
 class NotAbsoluteURLError(InvalidURL):
     pass
+
+
+class ResponseTooLarge(Exception):
+    pass
@@ -1,11 +1,18 @@
 import re
+import threading
 from abc import abstractmethod
-from collections.abc import Sequence
+from collections.abc import Iterable, Iterator, Sequence
+from functools import lru_cache
 from typing import TypeVar, Any, Type, Callable
 from urllib.parse import urlparse, urljoin
 
 from lxml import etree
-from lxml.cssselect import CSSSelector
+from lxml.cssselect import CSSSelector, LxmlTranslator
+
+try:
+    import re2
+except ImportError:
+    re2 = None
 
 from webants.libs import InvalidExtractor
 from webants.utils.logger import get_logger
@@ -15,6 +22,7 @@ from webants.utils.url import lenient_host, normalize_url
 __all__ = [
     "Link",
     # 函数
+    "parse_html",
     "iter_elements",
     "find_elements",
     "extract_attrib",
@@ -37,6 +45,92 @@ _ET = TypeVar(
     "_ET", "ElementExtractor", "LinkExtractor", "MediaExtractor", "TextExtractor"
 )
 
+# 每个线程复用一个HTMLParser，lxml的解析器不能在线程间共享
+_local = threading.local()
+
+
+def _html_parser() -> etree.HTMLParser:
+    parser = getattr(_local, "html_parser", None)
+    if parser is None:
+        # 不收集id索引表，减少解析时的内存分配
+        parser = _local.html_parser = etree.HTMLParser(collect_ids=False)
+    return parser
+
+
+def parse_html(html: str) -> etree._Element | None:
+    """将html字符串解析为etree._Element, 文档为空时返回None
+
+    :param html:
+    :return:
+    """
+    return etree.fromstring(html, _html_parser())
+
+
+# 与CSSSelector默认使用的转换器相同（支持:contains()），全局共用一个实例
+_CSS_TRANSLATOR = LxmlTranslator()
+
+
+@lru_cache(maxsize=512)
+def _xpath(expr: str) -> etree.XPath:
+    """编译并缓存XPath表达式"""
+    return etree.XPath(expr)
+
+
+@lru_cache(maxsize=512)
+def _css(selector: str) -> etree.XPath:
+    """将CSS选择器转换为XPath，编译并缓存"""
+    return _xpath(_CSS_TRANSLATOR.css_to_xpath(selector))
+
+
+# 同一站点的页面中常有大量重复的链接（导航栏、分页等），缓存规范化的结果
+_normalize_url = lru_cache(maxsize=4096)(normalize_url)
+_lenient_host = lru_cache(maxsize=4096)(lenient_host)
+
+
+# 与RFC 3986相同，scheme以字母开头，只包含字母、数字和"+-."
+_SCHEME_RE = re.compile(r"[A-Za-z][A-Za-z0-9+.-]*")
+
+
+def _split_url(url: str) -> tuple[str, str, str]:
+    """快速拆分URL，返回小写的(scheme, host, extension)
+
+    只做链接过滤需要的部分解析，scheme、host与urlparse的scheme、hostname一致，
+    extension为最后一段路径中"."之后的部分；不是绝对URL时返回空字符串
+
+    :param url:
+    :return:
+    """
+    scheme, sep, rest = url.strip().partition("://")
+    # "://"也可能出现在相对URL的查询参数中，如/redirect?to=http://x.com
+    if not sep or not _SCHEME_RE.fullmatch(scheme):
+        return "", "", ""
+
+    # netloc到第一个"/", "?", "#"为止
+    end = len(rest)
+    for c in "/?#":
+        i = rest.find(c, 0, end)
+        if i != -1:
+            end = i
+    netloc, path = rest[:end], rest[end:]
+
+    host = netloc.rpartition("@")[2]
+    if host.startswith("["):
+        host = host[1 : host.find("]")]
+    else:
+        host = host.partition(":")[0]
+
+    path = path.partition("?")[0].partition("#")[0]
+    # 与urlparse相同，去掉最后一段路径中的params
+    i = path.find(";", path.rfind("/"))
+    if i != -1:
+        path = path[:i]
+    # 最后一段路径中没有"."时没有扩展名
+    _, sep, ext = path.rpartition(".")
+    if not sep or "/" in ext:
+        ext = ""
+
+    return scheme.lower(), host.lower(), ext.lower()
+
 
 class Link:
     """Link class
@@ -54,10 +148,61 @@ class Link:
     def __repr__(self):
         return f"<Link {self.url}>"
 
+    def __eq__(self, other):
+        if isinstance(other, Link):
+            return self.url == other.url
+        return NotImplemented
+
+    def __hash__(self):
+        # 按url判断是否相同，可以直接用set去重
+        return hash(self.url)
+
     def remove_suffix(self, __suffix: str) -> "Link":
         return Link(url=self.url.removesuffix(__suffix), unique=self.unique)
 
 
+# 全局的inline flag，如(?i)，合并后会作用于所有的表达式
+_GLOBAL_FLAG_RE = re.compile(r"\(\?[aiLmsux]+\)")
+
+
+def _combine_regexps(regexps: list[re.Pattern], use_re2: bool = False) -> Any:
+    """将多个正则表达式合并为一个分支表达式，一次匹配代替逐个匹配
+
+    use_re2为True并且安装了google-re2时使用re2（DFA匹配，不会出现回溯爆炸），
+    re2不支持的语法回退到re。无法合并时返回None，由调用者逐个匹配：
+    合并会改变分组的编号，任何一个表达式中有分组（可能被反向引用）时都不合并；
+    全局inline flag（如(?i)）会作用于合并后的所有表达式，出现时也不合并
+
+    :param regexps:
+    :param use_re2: 是否使用re2
+    :return:
+    """
+    if not regexps:
+        return None
+    use_re2 = use_re2 and re2 is not None
+    if len(regexps) == 1 and not use_re2:
+        return regexps[0]
+    if any(_.groups or _GLOBAL_FLAG_RE.search(_.pattern) for _ in regexps):
+        return None
+    pattern = "|".join(f"(?:{_.pattern})" for _ in regexps)
+    if use_re2:
+        try:
+            return re2.compile(pattern)
+        except re2.error:
+            pass
+    try:
+        return re.compile(pattern)
+    except re.error:
+        return None
+
+
+def _lower_set(values: Sequence[str] | str | None) -> frozenset[str]:
+    """转换为小写字符串的frozenset"""
+    if not values:
+        return frozenset()
+    return frozenset(_.lower() for _ in args_to_list(values))
+
+
 def iter_elements(
     html: etree._Element,
     *,
@@ -80,15 +225,15 @@ def iter_elements(
         if attr is None:
             yield tag
         else:
-            if attr in tag.attrib.keys():
+            if tag.get(attr) is not None:
                 yield tag
 
 
 def find_elements(
     html: etree._Element | str,
     *,
-    selector: str = None,
-    xpath: str = None,
+    selector: str | CSSSelector = None,
+    xpath: str | etree.XPath = None,
     tags: Sequence[str] | str = None,
     attr: str = None,
 ) -> list[etree.ElementBase]:
@@ -107,15 +252,21 @@ def find_elements(
     ), f"Expected 'str' or 'etree._Element', got '{html.__class__.__name__}'"
 
     if isinstance(html, str):
-        html = etree.HTML(html)
+        html = parse_html(html)
+        if html is None:
+            return []
     # list of tag, attr
     tags = args_to_list(tags)
     # 更新实例属性
 
     if selector:
-        return html.cssselect(selector)
+        if isinstance(selector, etree.XPath):
+            return selector(html)
+        return _css(selector)(html)
     elif xpath:
-        return html.xpath(xpath)
+        if isinstance(xpath, etree.XPath):
+            return xpath(html)
+        return _xpath(xpath)(html)
     else:
         return iter_elements(
             html,
@@ -183,7 +334,33 @@ def extract_links(
         ), f"Expected str, got {base_url.__class__.__name__}"
         assert urlparse(base_url).scheme, f"Expected absolute URL, got {base_url}"
 
-    results = []
+    return [
+        Link(url=url, unique=unique)
+        for url in _iter_link_urls(
+            html, attr, selector=selector, xpath=xpath, tags=tags, base_url=base_url
+        )
+    ]
+
+
+def _iter_link_urls(
+    html: etree._Element | str,
+    attr: str = "href",
+    *,
+    selector: str = None,
+    xpath: str = None,
+    tags: Sequence[str] | str = None,
+    base_url: str = None,
+) -> Iterator[str | None]:
+    """迭代所有符合要求的URL字符串，不创建Link对象
+
+    :param html:
+    :param attr:
+    :param selector:
+    :param xpath:
+    :param tags:
+    :param base_url:
+    :return:
+    """
     for element in find_elements(
         html,
         selector=selector,
@@ -191,14 +368,8 @@ def extract_links(
         tags=tags,
         attr=attr,
     ):
-        if link := Link(
-            url=urljoin(base_url, element.attrib.get(attr))
-            if base_url
-            else element.attrib.get(attr),
-            unique=unique,
-        ):
-            results.append(link)
-    return results
+        url = element.attrib.get(attr)
+        yield urljoin(base_url, url) if base_url else url
 
 
 def extract_and_filter_links(
@@ -219,122 +390,48 @@ def extract_and_filter_links(
     link_process_func: Callable[[Link], Link] = None,
     unique: bool = True,
 ) -> list[Link]:
-    extensions_deny = [_.lower() for _ in set(args_to_list(extensions_deny))]
-    extensions_allow = [_.lower() for _ in set(args_to_list(extensions_allow))]
-
-    hosts_allow = [_.lower() for _ in set(args_to_list(hosts_allow))]
-    hosts_deny = [_.lower() for _ in set(args_to_list(hosts_deny))]
-
-    schemes_allow = [_.lower() for _ in set(args_to_list(schemes_allow))]
-    schemes_deny = [_.lower() for _ in set(args_to_list(schemes_deny))]
-
-    link_process_func = link_process_func or (lambda x: x)
-
-    def _extension_allowed(extension: str) -> bool:
-        if not extension:
-            return False
-        if extensions_allow:
-            return extension.lower() in extensions_allow
-        else:
-            return True
-
-    def _extension_denied(extension: str) -> bool:
-        if not extension:
-            return False
-        if extensions_deny:
-            return extension.lower() in extensions_deny
-        else:
-            return False
-
-    def _host_allowed(host: str) -> bool:
-        if hosts_allow:
-            return host.lower() in hosts_allow
-        else:
-            return True
+    """提取并过滤链接，过滤规则与FilteringLinkExtractor(lenient=True)相同
 
-    def _host_allowed_lenient(host: str) -> bool:
-        if hosts_allow:
-            hosts = [lenient_host(_) for _ in hosts_allow]
-            return lenient_host(host.lower()) in hosts
-        else:
-            return False
-
-    def _host_denied(host: str) -> bool:
-        if hosts_deny:
-            return host.lower() in hosts_deny
-        else:
-            return False
-
-    def _host_denied_lenient(host: str) -> bool:
-        if hosts_deny:
-            hosts = [lenient_host(_) for _ in hosts_deny]
-            return lenient_host(host.lower()) in hosts
-        else:
-            return False
-
-    def _scheme_allowed(scheme: str) -> bool:
-        if schemes_allow:
-            return scheme.lower() in schemes_allow
-        else:
-            return True
-
-    def _scheme_denied(scheme: str) -> bool:
-        if schemes_allow:
-            return scheme.lower() in schemes_deny
-        else:
-            return False
-
-    def _link_allowed(link: Link) -> bool:
-        if normalize:
-            link = normalize_url(link.url)
+    过滤器只与过滤条件有关，相同条件的过滤器只创建一次；
+    base_url通常每个页面都不同，不作为缓存的键，在每次调用时拼接URL
 
-        parts = urlparse(link)
-        host = parts.hostname
-        ext = parts.path.rsplit(".")[-1]
-        scheme = parts.scheme
-
-        if not host:
-            return False
-        if not scheme:
-            return False
+    :return:
+    """
+    if base_url:
+        assert isinstance(
+            base_url, str
+        ), f"Expected str, got {base_url.__class__.__name__}"
+        assert urlparse(base_url).scheme, f"Expected absolute URL, got {base_url}"
 
-        if not _scheme_allowed(scheme):
-            return False
-        if _scheme_denied(scheme):
-            return False
+    link_filter = _link_filter(
+        normalize=normalize,
+        extensions_deny=_as_tuple(extensions_deny),
+        extensions_allow=_as_tuple(extensions_allow),
+        hosts_allow=_as_tuple(hosts_allow),
+        hosts_deny=_as_tuple(hosts_deny),
+        schemes_allow=_as_tuple(schemes_allow),
+        schemes_deny=_as_tuple(schemes_deny),
+        link_process_func=link_process_func,
+        unique=unique,
+    )
+    return link_filter._filter_urls(
+        _iter_link_urls(
+            html, attr, selector=selector, xpath=xpath, tags=tags, base_url=base_url
+        )
+    )
 
-        if not _host_allowed(host):
-            return False
-        if not _host_allowed_lenient(host):
-            return False
-        if _host_denied(host):
-            return False
-        if _host_denied_lenient(host):
-            return False
 
-        if not _extension_allowed(ext):
-            return False
-        if _extension_denied(ext):
-            return False
+def _as_tuple(values: Sequence[str] | str | None) -> tuple | None:
+    """转换为可以作为缓存键的tuple"""
+    if values is None:
+        return None
+    return tuple(args_to_list(values))
 
-        return True
 
-    links = [
-        link_process_func(link)
-        for link in extract_links(
-            html,
-            selector=selector,
-            xpath=xpath,
-            tags=tags,
-            attr=attr,
-            base_url=base_url,
-        )
-        if _link_allowed(link)
-    ]
-    if unique:
-        return list(set(links))
-    else:
-        return links
+@lru_cache(maxsize=128)
+def _link_filter(**kwargs) -> "FilteringLinkExtractor":
+    """按过滤条件缓存的过滤器，只使用其中的过滤规则"""
+    return FilteringLinkExtractor(lenient=True, **kwargs)
 
 
 def extract_text(
@@ -369,25 +466,35 @@ def extract_text(
             if isinstance(element, str):
                 results.append(element)
             else:
-                results.extend(list(element.itertext()))
+                results.extend(element.itertext())
         else:
             results.append(element.text)
 
     return results
 
 
-def get_base_url(html) -> str | None:
-    try:
-        return extract_links(html, selector="base")[0].url
-    except (IndexError, AttributeError):
+def _first_element(
+    html: etree._Element | str | None, tag: str
+) -> etree._Element | None:
+    """返回第一个tag元素，找到后立即停止遍历"""
+    if isinstance(html, str):
+        try:
+            html = parse_html(html)
+        except ValueError:
+            return None
+    if html is None:
         return None
+    return next(html.iter(tag), None)
 
 
-def get_html_title(html: etree._Element | str) -> str | None:
-    try:
-        return extract_text(html, tags="title")[0]
-    except IndexError:
-        return None
+def get_base_url(html: etree._Element | str | None) -> str | None:
+    base = _first_element(html, "base")
+    return base.get("href") if base is not None else None
+
+
+def get_html_title(html: etree._Element | str | None) -> str | None:
+    title = _first_element(html, "title")
+    return title.text if title is not None else None
 
 
 class ExtractorFactory:
@@ -469,14 +576,15 @@ class _LxmlElementExtractor(BaseExtractor):
         "attr",
         "css_selector",
         "xpath_expr",
+        "_finder",
         "many",
         "logger",
     )
 
     def __init__(
         self,
-        selector: str = None,
-        xpath: str = None,
+        selector: str | CSSSelector = None,
+        xpath: str | etree.XPath = None,
         tags: Sequence[str] | str = None,
         attr: str = None,
         many: bool = True,
@@ -484,24 +592,28 @@ class _LxmlElementExtractor(BaseExtractor):
     ):
         """
 
-        :param selector: CSS 选择器
-        :param xpath: XPath路径表达式
+        :param selector: CSS 选择器，可以是字符串或已编译的CSSSelector
+        :param xpath: XPath路径表达式，可以是字符串或已编译的etree.XPath
         :param tags: 元素标签序列
         :param attr: 元素属性
         :param many: 是否提取全部，默认为True，为False是只提取第一个
         :param kwargs:
         """
         super(_LxmlElementExtractor, self).__init__()
-        # css selector expression
+        # css selector expression, 已编译的选择器直接复用
         self.selector = selector
-        if selector and isinstance(selector, str):
-            self.css_selector = CSSSelector(selector)
+        if isinstance(selector, etree.XPath):
+            self.css_selector = selector
+        elif selector and isinstance(selector, str):
+            self.css_selector = _css(selector)
         else:
             self.css_selector = None
         # xpath expression
         self.xpath = xpath
-        if xpath and isinstance(xpath, str):
-            self.xpath_expr = etree.XPath(xpath)
+        if isinstance(xpath, etree.XPath):
+            self.xpath_expr = xpath
+        elif xpath and isinstance(xpath, str):
+            self.xpath_expr = _xpath(xpath)
         else:
             self.xpath_expr = None
         # element tag
@@ -509,6 +621,15 @@ class _LxmlElementExtractor(BaseExtractor):
         # element attribute
         self.attr = attr
         self.many = many
+        # 查找元素的方式在初始化时确定，CSS选择器优先，其次是XPath，最后是tags和attr
+        if self.css_selector is not None:
+            self._finder = self.css_selector
+        elif self.xpath_expr is not None:
+            self._finder = self.xpath_expr
+        elif self.attr:
+            self._finder = self._iter_tags_with_attr
+        else:
+            self._finder = self._iter_tags
 
         self.logger = get_logger(self.__class__.__name__)
 
@@ -521,39 +642,22 @@ class _LxmlElementExtractor(BaseExtractor):
         """
         pass
 
-    def _find_elements(self, html: etree._Element) -> list[etree.ElementBase]:
-        """查找到符合要求的所有元素
+    def _iter_tags(self, html: etree._Element) -> list[etree.ElementBase]:
+        return [el for el in html.iter(*self.tags)]
 
-        :param html:
-        :return:
-        """
-
-        if self.selector:
-            # results = html.cssselect(self.selector)
-            results = self.css_selector(html)
-        elif self.xpath:
-            # results = html.xpath(self.xpath)
-            results = self.xpath_expr(html)
-        else:
-            if self.attr:
-                results = [
-                    el for el in html.iter(*self.tags) if self.attr in el.attrib.keys()
-                ]
-            else:
-                results = [el for el in html.iter(*self.tags)]
+    def _iter_tags_with_attr(self, html: etree._Element) -> list[etree.ElementBase]:
+        # el.get()不会像attrib.keys()那样为每个元素创建属性名列表
+        attr = self.attr
+        return [el for el in html.iter(*self.tags) if el.get(attr) is not None]
 
-        return results
+    def _root(self, html: etree._Element | str) -> etree._Element | None:
+        """将html文档转换为etree._Element，文档为空或无法解析时返回None
 
-    def extract(self, html: etree._Element | str) -> list[Any]:
-        """Run the CSS，XPath expression on this etree or
-        iterates over all elements with specific tags and attrs,
-        returning a list of the results.
-
-        :param html: xml, html document
-        :return: a list of the results
+        :param html:
+        :return:
         """
         if html is None:
-            return []
+            return None
 
         assert isinstance(
             html, (str, etree.ElementBase.__base__)
@@ -561,23 +665,35 @@ class _LxmlElementExtractor(BaseExtractor):
 
         if isinstance(html, str) and len(html) > 0:
             try:
-                html = etree.HTML(html)
+                return parse_html(html)
             except ValueError as e:
                 self.logger.error(e)
-                return []
+                return None
         elif isinstance(html, etree.ElementBase.__base__):
-            html = html
+            return html
         else:
+            return None
+
+    def extract(self, html: etree._Element | str) -> list[Any]:
+        """Run the CSS，XPath expression on this etree or
+        iterates over all elements with specific tags and attrs,
+        returning a list of the results.
+
+        :param html: xml, html document
+        :return: a list of the results
+        """
+        html = self._root(html)
+        if html is None:
             return []
 
         results = []
 
-        elements = self._find_elements(html)
+        elements = self._finder(html)
 
         for element in elements:
             result = self._extract_element(element)
             if result is not None:
-                if isinstance(result, list):
+                if isinstance(result, (list, Iterator)):
                     results.extend(result)
                 else:
                     results.append(result)
@@ -664,19 +780,42 @@ class LinkExtractor(AttribExtractor):
             ).scheme, f"Expected absolute URL, got {self.base_url}"
         self.unique = unique
 
+    def _extract_url(self, element: etree._Element | str) -> str | None:
+        try:
+            return urljoin(self.base_url, element.attrib.get(self.attr))
+        except AttributeError:
+            return None
+
     def _extract_element(self, element: etree._Element | str) -> Link | None:
         """
 
         :param element:
         :return:
         """
-        try:
-            return Link(
-                url=urljoin(self.base_url, element.attrib.get(self.attr)),
-                unique=self.unique,
-            )
-        except AttributeError:
+        url = self._extract_url(element)
+        if url is None:
             return None
+        return Link(url=url, unique=self.unique)
+
+    def extract_urls(self, html: etree._Element | str) -> list[str]:
+        """提取URL字符串列表，不创建Link对象
+
+        :param html: xml, html document
+        :return:
+        """
+        html = self._root(html)
+        if html is None:
+            return []
+
+        urls = [
+            url
+            for url in map(self._extract_url, self._finder(html))
+            if url is not None
+        ]
+        if self.many:
+            return urls
+        else:
+            return urls[:1]
 
 
 class ElementExtractor(_LxmlElementExtractor):
@@ -715,17 +854,18 @@ class TextExtractor(_LxmlElementExtractor):
 
         self.iter_text = iter_text
 
-    def _extract_element(self, element: etree.ElementBase) -> list[str] | str | None:
+    def _extract_element(
+        self, element: etree.ElementBase
+    ) -> Iterator[str] | list[str] | str | None:
         if self.iter_text:
             if isinstance(element, str):
                 return element
             else:
-                text = ""
+                # 直接返回迭代器，由extract()展开，不创建中间列表
                 try:
-                    text = element.itertext()
+                    return element.itertext()
                 except ValueError:
-                    pass
-                return list(text)
+                    return []
         else:
             return element.text
 
@@ -734,6 +874,10 @@ class FilteringLinkExtractor(BaseExtractor):
     """FilteringExtractor class
 
     从html页面中提取特定的元素，并进行过滤
+
+    regexps_allow/regexps_deny默认使用标准库re匹配；use_re2为True并且安装了
+    google-re2时，合并后的表达式改用re2匹配（线性时间，但不支持反向引用、
+    环视等语法，不支持的表达式仍使用re）
     """
 
     def __init__(
@@ -758,27 +902,39 @@ class FilteringLinkExtractor(BaseExtractor):
         log_level: int = 20,
         many: bool = True,
         unique: bool = True,
+        use_re2: bool = False,
     ):
         super(FilteringLinkExtractor, self).__init__()
         self.normalize = normalize
 
-        self.extensions_deny = [_.lower() for _ in set(args_to_list(extensions_deny))]
-        self.extensions_allow = [_.lower() for _ in set(args_to_list(extensions_allow))]
+        # 使用frozenset，成员判断为O(1)
+        self.extensions_deny = _lower_set(extensions_deny)
+        self.extensions_allow = _lower_set(extensions_allow)
 
-        self.hosts_allow = [_.lower() for _ in set(args_to_list(hosts_allow))]
-        self.hosts_deny = [_.lower() for _ in set(args_to_list(hosts_deny))]
+        self.hosts_allow = _lower_set(hosts_allow)
+        self.hosts_deny = _lower_set(hosts_deny)
+        # 松散化的host集合只在初始化时计算一次
+        self._hosts_allow_lenient = frozenset(lenient_host(_) for _ in self.hosts_allow)
+        self._hosts_deny_lenient = frozenset(lenient_host(_) for _ in self.hosts_deny)
 
+        # 去掉重复的表达式，保持给定的顺序
         self.regexps_allow = [
             re.compile(_)
-            for _ in set(args_to_list(regexps_allow))
+            for _ in dict.fromkeys(args_to_list(regexps_allow))
             if isinstance(_, str)
         ]
         self.regexps_deny = [
-            re.compile(_) for _ in set(args_to_list(regexps_deny)) if isinstance(_, str)
+            re.compile(_)
+            for _ in dict.fromkeys(args_to_list(regexps_deny))
+            if isinstance(_, str)
         ]
 
-        self.schemes_allow = [_.lower() for _ in set(args_to_list(schemes_allow))]
-        self.schemes_deny = [_.lower() for _ in set(args_to_list(schemes_deny))]
+        # 合并后的正则表达式，每个链接只需匹配一次
+        self._allow_re = _combine_regexps(self.regexps_allow, use_re2)
+        self._deny_re = _combine_regexps(self.regexps_deny, use_re2)
+
+        self.schemes_allow = _lower_set(schemes_allow)
+        self.schemes_deny = _lower_set(schemes_deny)
 
         self.link_extractor = LinkExtractor(
             selector=selector,
@@ -790,115 +946,83 @@ class FilteringLinkExtractor(BaseExtractor):
             unique=unique,
         )
         self.lenient = lenient
+        # 预先计算各过滤条件是否为空，link_allowed中直接判断
+        self._has_schemes_allow = bool(self.schemes_allow)
+        self._has_schemes_deny = bool(self.schemes_deny)
+        self._has_hosts_allow = bool(self.hosts_allow)
+        self._has_hosts_deny = bool(self.hosts_deny)
+        self._has_extensions_allow = bool(self.extensions_allow)
+        self._has_extensions_deny = bool(self.extensions_deny)
 
         self.link_process_func = link_process_func or (lambda x: x)
         self.logger = get_logger(self.__class__.__name__, log_level=log_level)
 
-    def _extension_allowed(self, extension: str) -> bool:
-        if self.extensions_allow:
-            if not extension:
-                return False
-            return extension.lower() in self.extensions_allow
-        else:
-            return True
-
-    def _extension_denied(self, extension: str) -> bool:
-        if not extension:
-            return False
-        if self.extensions_deny:
-            return extension.lower() in self.extensions_deny
-        else:
-            return False
-
-    def _host_allowed(self, host: str) -> bool:
-        if self.hosts_allow:
-            return host.lower() in self.hosts_allow
-        else:
-            return True
-
-    def _host_allowed_lenient(self, host: str) -> bool:
-        if self.hosts_allow:
-            hosts = [lenient_host(_) for _ in self.hosts_allow]
-            return lenient_host(host.lower()) in hosts
-        else:
-            return False
-
-    def _host_denied(self, host: str) -> bool:
-        if self.hosts_deny:
-            return host.lower() in self.hosts_deny
-        else:
-            return False
-
-    def _host_denied_lenient(self, host: str) -> bool:
-        if self.hosts_deny:
-            hosts = [lenient_host(_) for _ in self.hosts_deny]
-            return lenient_host(host.lower()) in hosts
-        else:
-            return False
-
-    def _scheme_allowed(self, scheme: str) -> bool:
-        if self.schemes_allow:
-            return scheme.lower() in self.schemes_allow
-        else:
-            return True
-
-    def _scheme_denied(self, scheme: str) -> bool:
-        if self.schemes_deny:
-            return scheme.lower() in self.schemes_deny
-        else:
-            return False
-
     def _regex_allowed(self, url: str) -> bool:
+        if self._allow_re is not None:
+            return self._allow_re.search(url) is not None
         if self.regexps_allow:
             return any(r.search(url) for r in self.regexps_allow)
         else:
             return True
 
     def _regex_denied(self, url: str) -> bool:
+        if self._deny_re is not None:
+            return self._deny_re.search(url) is not None
         if self.regexps_deny:
             return any(r.search(url) for r in self.regexps_deny)
         else:
             return False
 
+    @classmethod
+    def clear_caches(cls) -> None:
+        """清空URL规范化及host松散化的缓存"""
+        _normalize_url.cache_clear()
+        _lenient_host.cache_clear()
+
     def link_allowed(self, link: Link) -> bool:
-        if self.normalize:
-            link = normalize_url(link.url)
+        return self._url_allowed(link.url)
 
-        parts = urlparse(link)
-        host = parts.hostname
-        ext = parts.path.rsplit(".")[-1]
-        scheme = parts.scheme
-        self.logger.debug(f"{link} {ext}")
+    def _url_allowed(self, url: str) -> bool:
+        url = _normalize_url(url) if self.normalize else url
+        scheme, host, ext = _split_url(url)
+        self.logger.debug("%s %s", url, ext)
 
-        if not host:
-            return False
-        if not scheme:
+        if not host or not scheme:
             return False
 
-        if not self._scheme_allowed(scheme):
+        # 按开销从小到大依次判断：scheme, host, extension, regex
+        if self._has_schemes_allow and scheme not in self.schemes_allow:
             return False
-        if self._scheme_denied(scheme):
+        if self._has_schemes_deny and scheme in self.schemes_deny:
             return False
 
         if not self.lenient:
-            if not self._host_allowed(host):
+            if self._has_hosts_allow and host not in self.hosts_allow:
                 return False
-            if self._host_denied(host):
+            if self._has_hosts_deny and host in self.hosts_deny:
                 return False
         else:
-            if not self._host_allowed_lenient(host):
+            # 先精确匹配，未命中时才计算松散化的host
+            if (
+                self._has_hosts_allow
+                and host not in self.hosts_allow
+                and _lenient_host(host) not in self._hosts_allow_lenient
+            ):
                 return False
-            if self._host_denied_lenient(host):
+            if self._has_hosts_deny and (
+                host in self.hosts_deny
+                or _lenient_host(host) in self._hosts_deny_lenient
+            ):
                 return False
 
-        if not self._extension_allowed(ext):
+        if self._has_extensions_allow and (not ext or ext not in self.extensions_allow):
             return False
-        if self._extension_denied(ext):
+        if self._has_extensions_deny and ext and ext in self.extensions_deny:
             return False
 
-        if not self._regex_allowed(link):
+        if not self._regex_allowed(url):
             return False
-        if self._regex_denied(link):
+        if self._regex_denied(url):
             return False
 
         return True
@@ -914,13 +1038,32 @@ class FilteringLinkExtractor(BaseExtractor):
         :return:
         """
 
-        links = self.link_extractor.extract(html)
-        self.logger.debug(f"origin: {links}")
-        links = [
-            self.link_process_func(link) for link in links if self.link_allowed(link)
-        ]
-        self.logger.debug(f"filtered: {links}")
-        return links
+        urls = self.link_extractor.extract_urls(html)
+        self.logger.debug("origin: %s", urls)
+        return self._filter_urls(urls)
+
+    def _filter_urls(self, urls: Iterable[str | None]) -> list[Link]:
+        """过滤URL字符串，返回通过过滤的Link列表
+
+        :param urls:
+        :return:
+        """
+        # 唯一的链接会被调度器去重，这里先按url去重，重复的链接只过滤一次
+        # 过滤在URL字符串上进行，只为通过过滤的URL创建Link
+        unique = self.link_extractor.unique
+        seen = set()
+        results = []
+        for url in urls:
+            if not url:
+                continue
+            if unique:
+                if url in seen:
+                    continue
+                seen.add(url)
+            if self._url_allowed(url):
+                results.append(self.link_process_func(Link(url=url, unique=unique)))
+        self.logger.debug("filtered: %s", results)
+        return results
 
 
 class RegexExtractor(BaseExtractor):
@@ -68,7 +68,8 @@ class Item:
 
     # 数据描述器
     field = ExtractorDescriptor()
-    html: str = ""
+    # html文档，可以是字符串，也可以是已解析的etree._Element
+    html: str | lxml.etree._Element = ""
 
 
 class AttrItem(Item):
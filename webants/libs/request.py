@@ -35,6 +35,7 @@
 
  """
 
+from inspect import iscoroutinefunction
 from typing import Callable, Final
 
 from webants.libs.exceptions import InvalidRequestMethod
@@ -57,7 +58,8 @@ class Request:
         "method",
         "headers",
         "referer",
-        "callback",
+        "_callback",
+        "_callback_is_coro",
         "cb_kwargs",
         "delay",
         "timeout",
@@ -120,6 +122,21 @@ class Request:
         self.unique = unique
         Request.count += 1
 
+    @property
+    def callback(self) -> Callable | None:
+        return self._callback
+
+    @callback.setter
+    def callback(self, callback: Callable | None):
+        # 设置回调函数时即判断是否为协程函数，避免下载时对每个响应重复判断
+        self._callback = callback
+        self._callback_is_coro = iscoroutinefunction(callback)
+
+    @property
+    def callback_is_coro(self) -> bool:
+        """回调函数是否为协程函数"""
+        return self._callback_is_coro
+
     def __repr__(self):
         return f"<Request({self.method} {self.url})[{self.priority}]>"
 
@@ -37,6 +37,7 @@ except ImportError:
 
 from webants.libs.request import Request
 from webants.libs import get_html_title
+from webants.libs.exceptions import ResponseTooLarge
 
 UNKNOWN = None
 
@@ -73,6 +74,17 @@ def get_mediatype(headers: Mapping):
     return mediatype
 
 
+def _is_text(mediatype: str | None) -> bool:
+    """是否为文本类型的MediaType"""
+    if not mediatype:
+        return False
+    return (
+        mediatype.startswith("text/")
+        or mediatype.endswith(("+xml", "+json", "/xml", "/json"))
+        or mediatype == "application/javascript"
+    )
+
+
 class Response:
     """Response class"""
 
@@ -124,7 +136,8 @@ class Response:
         self.body = body
         self._encoding = encoding
 
-        self.history = weakref.WeakSet(history)
+        # 没有重定向历史时使用空元组，避免为每个响应创建WeakSet
+        self.history = weakref.WeakSet(history) if history else ()
 
         self.request = request
 
@@ -139,11 +152,31 @@ class Response:
         return f"<Response {self.url} [{self.status_code}]>"
 
     @classmethod
-    async def build(cls, r: aiohttp.ClientResponse, request: Request):
+    async def build(
+        cls,
+        r: aiohttp.ClientResponse,
+        request: Request,
+        max_body_size: int | None = None,
+    ):
+        """根据aiohttp.ClientResponse创建Response
+
+        :param r:
+        :param request:
+        :param max_body_size: 响应体的最大字节数，超过时抛出ResponseTooLarge，为None时不限制
+        :return:
+        """
         assert isinstance(
             r, aiohttp.ClientResponse
         ), f"Expected {aiohttp.ClientResponse}, got {r.__class__.__name__}"
 
+        if max_body_size is None:
+            body = await r.read()
+        else:
+            body = await cls._read_limited(r, max_body_size)
+        # 只取响应头中声明的编码，未声明时由Response.encoding在首次访问时根据body检测，
+        # 不在下载时进行编码检测（chardet）
+        encoding = get_encoding(r.headers) if r.headers else None
+
         return cls(
             r.method,
             str(r.real_url),
@@ -153,18 +186,58 @@ class Response:
             http_version=r.version,
             headers=r.headers,
             cookies=r.cookies,
-            body=await r.read(),
-            encoding=r.get_encoding(),
+            body=body,
+            encoding=encoding,
             history=r.history,
         )
 
+    @staticmethod
+    async def _read_limited(r: aiohttp.ClientResponse, max_body_size: int) -> bytes:
+        """分块读取响应体，超过max_body_size时立即中止"""
+        if r.content_length is not None and r.content_length > max_body_size:
+            raise ResponseTooLarge(
+                f"Content-Length {r.content_length} exceeds {max_body_size} bytes"
+            )
+
+        body = bytearray()
+        async for chunk in r.content.iter_chunked(64 * 1024):
+            body.extend(chunk)
+            if len(body) > max_body_size:
+                raise ResponseTooLarge(f"Body exceeds {max_body_size} bytes")
+        return bytes(body)
+
+    def set_body(self, body: bytes | str) -> "Response":
+        """替换响应体，并清除由响应体计算出的缓存（编码、文本、标题等）
+
+        :param body: 新的响应体，为str时按utf-8编码
+        :return: self
+        """
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+            self._encoding = "utf-8"
+        self.body = body
+        self._cache.clear()
+        return self
+
     @property
     def encoding(self):
-        return self._encoding or get_encoding(self.headers, self.body)
+        # 编码检测（chardet）开销较大，只在首次访问时进行并缓存结果
+        if "encoding" not in self._cache:
+            encoding = self._encoding
+            if not encoding and (self.headers or self.body):
+                encoding = get_encoding(self.headers, self.body)
+            # 与aiohttp相同，空响应体或文本类型无法检测出编码时使用utf-8
+            if not encoding and (not self.body or _is_text(self.mediatype)):
+                encoding = "utf-8"
+            self._cache["encoding"] = encoding
+        return self._cache["encoding"]
 
     @property
     def host(self):
-        return urlparse(self.url).netloc
+        # 同一响应的host可能被多处使用，只解析一次URL
+        if "host" not in self._cache:
+            self._cache["host"] = urlparse(self.url).netloc
+        return self._cache["host"]
 
     @property
     def json(self) -> Any:
@@ -199,7 +272,15 @@ class Response:
 
     @property
     def text(self) -> str | None:
-        """Read response payload and decode."""
+        """Read response payload and decode.
+
+        解码结果会被缓存，只需要原始字节时请直接使用body
+        """
+        if "text" not in self._cache:
+            self._cache["text"] = self._decode()
+        return self._cache["text"]
+
+    def _decode(self) -> str | None:
         if self.encoding is UNKNOWN:
             return None
 
@@ -212,4 +293,6 @@ class Response:
 
     @property
     def title(self) -> str | None:
-        return get_html_title(self.text)
+        if "title" not in self._cache:
+            self._cache["title"] = get_html_title(self.text)
+        return self._cache["title"]
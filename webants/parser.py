@@ -7,10 +7,11 @@
 
 """
 import asyncio
+import logging
 import time
 from typing import Iterable
 
-from webants.libs import Response, Link, Request, Result, Field
+from webants.libs import Response, Link, Request, Result, Field, parse_html
 from webants.libs.item import Item, ItemDescriptor
 from webants.utils import get_logger
 
@@ -59,11 +60,17 @@ class Parser(metaclass=ParserMeta):
 
         self.work_dir = self.kwargs.get("work_dir", None)
 
-    async def _next_response(self):
-        """获取下一个请求"""
+    async def _next_response(self) -> list[Response]:
+        """获取下一批响应
+
+        Downloader按批次放入响应列表，单个响应也包装为列表返回
+        """
         if self.response_queue:
-            self.parsed_response_count += 1
-            return await self.response_queue.get()
+            responses = await self.response_queue.get()
+            if not isinstance(responses, list):
+                responses = [responses]
+            self.parsed_response_count += len(responses)
+            return responses
 
     def _enqueue_raw_request(self, request: Request):
         if self.raw_request_queue:
@@ -94,20 +101,30 @@ class Parser(metaclass=ParserMeta):
         :return:
         """
         if isinstance(resp_or_str, Response):
-            self.logger.debug(f"parse {resp_or_str} {resp_or_str.mediatype}")
+            # mediatype需要解析响应头，只在debug级别时计算
+            if self.logger.isEnabledFor(logging.DEBUG):
+                self.logger.debug("parse %s %s", resp_or_str, resp_or_str.mediatype)
             self.html = resp_or_str.text
         else:
             self.html = resp_or_str
 
         items: dict = getattr(self, "__items__", None)
         assert items is not None and isinstance(items, dict), f"请定义item"
+        # 只解析一次文档，所有Item共享同一棵树，避免每个Item重复解析
+        # 无法解析时（如带encoding声明的XHTML字符串），交给各个Item自行处理
+        try:
+            tree = parse_html(self.html) if self.html else None
+        except ValueError as e:
+            self.logger.debug("parse_html failed: %s", e)
+            tree = None
+        document = tree if tree is not None else self.html
         for item_name, item_ins in items.items():
             if isinstance(item_ins, Item):
-                item_ins.html = self.html
+                item_ins.html = document
                 # yield 属性名称和提取结果
                 yield item_name, item_ins.field
             elif isinstance(item_ins, ItemDescriptor):
-                setattr(self, item_name, self.html)
+                setattr(self, item_name, document)
                 yield item_name, getattr(self, item_name)
 
     def process_response(self, response: Response) -> Response:
@@ -119,52 +136,55 @@ class Parser(metaclass=ParserMeta):
         """
         return response
 
+    def _handle_response(self, response: Response):
+        """解析单个响应，将结果放入相应的队列"""
+        if response.text is None:
+            item_name = response.request.cb_kwargs.get("field")
+            field = Field()
+            field[item_name] = response.body
+            result = Result(
+                spider=self.spider,
+                field=field,
+                url=response.url,
+                mediatype=response.mediatype,
+                title=response.request.cb_kwargs.get("title"),
+                crawl_time=time.time(),
+            )
+            self.logger.debug("%s: %s", item_name, result)
+            self._enqueue_result(result)
+        else:
+            for item_name, items in self._parse(response):
+                #
+                if not items:
+                    continue
+
+                for item in items:
+                    if isinstance(item, Link):
+                        self.logger.debug("%5s: %s", item_name, item)
+                        request = Request(
+                            item.url,
+                            referer=response.request,
+                            cb_kwargs={"field": item_name, "title": response.title},
+                        )
+                        self._enqueue_raw_request(request)
+                    else:
+                        field = Field()
+                        field[item_name] = item
+                        result = Result(
+                            spider=self.spider,
+                            field=field,
+                            url=response.url,
+                            mediatype=response.mediatype,
+                            title=response.title,
+                            crawl_time=time.time(),
+                        )
+                        self.logger.debug("%5s: %s", item_name, result)
+                        self._enqueue_result(result)
+
     async def start_worker(self):
         while True:
-            response = self.process_response(await self._next_response())
-
-            if response.text is None:
-                item_name = response.request.cb_kwargs.get("field")
-                field = Field()
-                field[item_name] = response.body
-                result = Result(
-                    spider=self.spider,
-                    field=field,
-                    url=response.url,
-                    mediatype=response.mediatype,
-                    title=response.request.cb_kwargs.get("title"),
-                    crawl_time=time.time(),
-                )
-                self.logger.debug(f"{item_name}: {result}")
-                self._enqueue_result(result)
-            else:
-                for item_name, items in self._parse(response):
-                    #
-                    if not items:
-                        continue
-
-                    for item in items:
-                        if isinstance(item, Link):
-                            self.logger.debug(f"{item_name:>5}: {item}")
-                            request = Request(
-                                item.url,
-                                referer=response.request,
-                                cb_kwargs={"field": item_name, "title": response.title},
-                            )
-                            self._enqueue_raw_request(request)
-                        else:
-                            field = Field()
-                            field[item_name] = item
-                            result = Result(
-                                spider=self.spider,
-                                field=field,
-                                url=response.url,
-                                mediatype=response.mediatype,
-                                title=response.title,
-                                crawl_time=time.time(),
-                            )
-                            self.logger.debug(f"{item_name:>5}: {result}")
-                            self._enqueue_result(result)
+            for response in await self._next_response():
+                self._handle_response(self.process_response(response))
 
             self.response_queue.task_done()
 
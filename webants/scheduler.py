@@ -1,4 +1,6 @@
 import asyncio
+import heapq
+from collections import deque
 from typing import Iterable, Callable
 
 from webants.libs import Request
@@ -13,6 +15,49 @@ class Handler:
         pass
 
 
+class BucketPriorityQueue(asyncio.PriorityQueue):
+    """按优先级分桶的优先级队列
+
+    队列元素为(priority, request)元组。爬虫的优先级是少量离散的整数，
+    相同优先级的元素放入同一个deque中（先进先出），堆中只保存互不相同的优先级，
+    put/get的开销取决于优先级的种类数，而不是队列长度。
+    task_done/join等语义继承自asyncio.Queue。
+    """
+
+    def _init(self, maxsize):
+        # 优先级 -> 元素deque，只保存非空的桶
+        self._buckets: dict[int, deque] = {}
+        # 非空桶的优先级（小顶堆）
+        self._priorities: list[int] = []
+        self._size = 0
+        self._queue = self._buckets
+
+    def _put(self, item):
+        priority = item[0]
+        bucket = self._buckets.get(priority)
+        if bucket is None:
+            bucket = self._buckets[priority] = deque()
+            heapq.heappush(self._priorities, priority)
+        bucket.append(item)
+        self._size += 1
+
+    def _get(self):
+        priority = self._priorities[0]
+        bucket = self._buckets[priority]
+        item = bucket.popleft()
+        if not bucket:
+            del self._buckets[priority]
+            heapq.heappop(self._priorities)
+        self._size -= 1
+        return item
+
+    def qsize(self) -> int:
+        return self._size
+
+    def empty(self) -> bool:
+        return not self._size
+
+
 class Scheduler(object):
     """调度器"""
 
@@ -25,9 +70,10 @@ class Scheduler(object):
         **kwargs,
     ):
         self.raw_request_queue = raw_request_queue
-        self.request_queue = request_queue or asyncio.PriorityQueue()
+        self.request_queue = request_queue or BucketPriorityQueue()
         self.request_handlers = kwargs.get("handlers")
-        self.seen_urls = set()  # 已经调度过的url集合
+        # 已经调度过的请求指纹集合，只保存指纹的前64位整数，节省内存
+        self.seen_hashes: set[int] = set()
         self.logger = get_logger(self.__class__.__name__, log_level=log_level)
         self.running = False
 
@@ -38,9 +84,10 @@ class Scheduler(object):
         :return:
         """
         if request.unique:
-            if (fp := request.fingerprint()) not in self.seen_urls:
+            fp = int.from_bytes(request.fingerprint()[:8], "big")
+            if fp not in self.seen_hashes:
                 # self.request_queue.put_nowait((request.priority, request))
-                self.seen_urls.add(fp)
+                self.seen_hashes.add(fp)
                 return request
             # self.logger.debug(f"{request} has been seen")
             return None
@@ -55,7 +102,7 @@ class Scheduler(object):
         #     self.request_queue.put_nowait((request.priority, request))
         #     self.seen_urls.add(fp)
         if request := self._filter_request(request):
-            self.logger.debug(f"Enqueue: {request}")
+            self.logger.debug("Enqueue: %s", request)
             self.request_queue.put_nowait((request.priority, request))
 
         # self.logger.debug(f"request_queue:{self.request_queue.qsize()}")
@@ -65,6 +112,11 @@ class Scheduler(object):
         """获取下一个请求"""
         return await self.raw_request_queue.get()
 
+    @property
+    def seen_urls(self) -> set[int]:
+        """兼容旧接口，返回已调度的请求指纹集合"""
+        return self.seen_hashes
+
     async def close(self):
         if self.running:
             self.running = False
@@ -12,8 +12,8 @@ from urllib.parse import urlparse, unquote_plus
 from webants.downloader import Downloader, BaseDownloader
 from webants.libs import Request, Result, InvalidParser, Response
 from webants.parser import Parser
-from webants.scheduler import Scheduler
-from webants.utils import get_logger, args_to_list
+from webants.scheduler import Scheduler, BucketPriorityQueue
+from webants.utils import get_logger, args_to_list, new_event_loop
 
 
 class Spider:
@@ -40,7 +40,7 @@ class Spider:
         # 原生请求队列,用于初始化请求以及Parser组件与Scheduler组件间的通信
         self.raw_request_queue = asyncio.Queue()
         # 请求队列,用于Scheduler组件与Downloader组件间的通信
-        self.request_queue = asyncio.PriorityQueue()
+        self.request_queue = BucketPriorityQueue()
         # 响应队列，用于Downloader组件与Parser组件间的通信
         self.response_queue = asyncio.Queue()
         # 结果队列，用于Parser组件与Spider组件间的通信
@@ -56,7 +56,7 @@ class Spider:
         try:
             self.loop = asyncio.get_running_loop()
         except RuntimeError:
-            self.loop = asyncio.new_event_loop()
+            self.loop = new_event_loop()
             asyncio.set_event_loop(self.loop)
             self._close_loop = True
         self.logger.debug(self.loop)
@@ -93,7 +93,7 @@ class Spider:
         self.start_time = time.time_ns()
 
     def _enqueue_raw_request(self, request: Request):
-        self.logger.debug(f"RAW: {request}")
+        self.logger.debug("RAW: %s", request)
         # request = self.process_request(request)
         self.raw_request_queue.put_nowait(request)
 
@@ -169,7 +169,7 @@ class Spider:
                     # 遍历本地文件,包装成file URL后,放入request_queue队列中
                     for p in path.iterdir():
                         if p.is_file():
-                            self.logger.debug(f"{p}")
+                            self.logger.debug("%s", p)
                             request = Request(
                                 url=unquote_plus(p.as_uri()), unique=self.unique
                             )
@@ -269,7 +269,7 @@ class Spider:
 
     @property
     def seen_count(self):
-        return self.scheduler.seen_urls.__len__()
+        return len(self.scheduler.seen_hashes)
 
     def start(self, many: int = 0):
         """启动爬虫
@@ -277,10 +277,13 @@ class Spider:
         :return:
         """
 
+        main_task = self.loop.create_task(self.run(many))
         try:
-            self.loop.run_until_complete(self.run(many))
+            self.loop.run_until_complete(main_task)
         except KeyboardInterrupt:
             self.logger.exception("KeyboardInterrupt, closing...")
+            # 先取消主任务，避免其在close()之前再次抛出KeyboardInterrupt（如uvloop）
+            main_task.cancel()
             self.loop.run_until_complete(self.close())
         except AssertionError:
             self.logger.exception("AssertionError, closing...")
@@ -304,7 +307,7 @@ class Spider:
     async def status_monitoring(self):
         def _check_task_status():
             all_tasks = asyncio.all_tasks()
-            self.logger.debug(f"Task: {all_tasks}")
+            self.logger.debug("Task: %s", all_tasks)
             self.logger.info(f"Task count: {len(all_tasks)}")
 
         while True:
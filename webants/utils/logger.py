@@ -36,16 +36,18 @@ def get_logger(log_name: str,
         # 将创建的文件和流处理器添加logger中
         _logger.addHandler(file_handler)
 
-    # 创建流输出处理器，用于输出
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(stream_handler_level)
+    # 同名的logger是同一个对象，已经有流处理器时不再重复添加，避免日志重复输出
+    if not any(type(_) is logging.StreamHandler for _ in _logger.handlers):
+        # 创建流输出处理器，用于输出
+        stream_handler = logging.StreamHandler()
+        stream_handler.setLevel(stream_handler_level)
 
-    # 定义输出格式
-    stream_formatter = logging.Formatter('%(asctime)s:[%(name)s]%(levelname)s:%(message)s')
-    stream_handler.setFormatter(stream_formatter)
+        # 定义输出格式
+        stream_formatter = logging.Formatter('%(asctime)s:[%(name)s]%(levelname)s:%(message)s')
+        stream_handler.setFormatter(stream_formatter)
 
-    # 将创建的流处理器添加logger中
-    _logger.addHandler(stream_handler)
+        # 将创建的流处理器添加logger中
+        _logger.addHandler(stream_handler)
 
     _logger.setLevel(log_level)
     return _logger
@@ -1,9 +1,18 @@
+import asyncio
 import re
+import sys
 from typing import Any
 
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
 __all__ = [
     'args_to_list',
     'copy_object',
+    'cpu_bound',
+    'new_event_loop',
     'valid_path',
 ]
 
@@ -36,3 +45,21 @@ def copy_object(obj: object, *args, **kwargs):
     cls: type = kwargs.pop('cls', obj.__class__)
 
     return cls(*args, **kwargs)
+
+
+def cpu_bound(func):
+    """标记回调函数为CPU密集型，下载器将在进程池中调用它
+
+    被标记的回调函数接收(response.body, cb_kwargs)两个参数，
+    返回处理后的响应体（bytes或str），下载器用它替换原响应的响应体后交给Parser；
+    返回None时丢弃该响应。回调函数必须是可以被pickle的模块级函数
+    """
+    func._cpu_bound = True
+    return func
+
+
+def new_event_loop() -> asyncio.AbstractEventLoop:
+    """创建新的事件循环，如果安装了uvloop（非Windows平台），优先使用uvloop"""
+    if uvloop is not None and sys.platform != 'win32':
+        return uvloop.new_event_loop()
+    return asyncio.new_event_loop()